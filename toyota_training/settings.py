@@ -29,6 +29,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# No proxy in front of the development server; rate limits key on REMOTE_ADDR
+TRUSTED_PROXY_HOPS = 0
+
 
 # Application definition
 
@@ -160,6 +160,10 @@ SECURE_HSTS_PRELOAD = True
 SECURE_SSL_REDIRECT = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
+# Number of proxies in front of the app that append to X-Forwarded-For
+# (Railway/Render add exactly one). Rate limiting keys on the entry they add.
+TRUSTED_PROXY_HOPS = 1
+
 # Session security
 SESSION_COOKIE_SECURE = True
 SESSION_COOKIE_HTTPONLY = True
@@ -247,13 +251,22 @@ LOGGING = {
     },
 }
 
-# Cache configuration (use database cache for simplicity)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
-        'LOCATION': 'cache_table',
+# Cache configuration
+# Use Redis when available (atomic counters for rate limiting), otherwise the database cache
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cache_table',
+        }
     }
-}
 
 # Session engine
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
@@ -277,7 +290,7 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
-# Rate limiting disabled for now (would need django-ratelimit package)
+# Rate limiting uses the default cache (see training_app.security.rate_limit_requests)
 
 # Admin URL for security
 ADMIN_URL = os.environ.get('ADMIN_URL', 'django-admin/')
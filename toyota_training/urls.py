@@ -27,7 +27,7 @@ urlpatterns = [
     path('django-admin/', admin.site.urls),
     
     # Simple Admin Interface
-    path('', include('training_app.simple_admin_urls')),
+    path('simple-admin/', include('training_app.simple_admin_urls')),
     
     # Custom Admin Authentication
     path('admin/login/', views.admin_login, name='admin_login'),
@@ -37,14 +37,14 @@ urlpatterns = [
     # Home redirect (must be before training_app URLs)
     path('', views.home_redirect, name='home'),
     
-    # Training app URLs (regional pages)
-    path('', include('training_app.urls')),
-    
-    # Health check endpoints
+    # Health check endpoints (must be before the '<str:region>/' catch-all)
     path('health/', health_check, name='health_check'),
     path('health/detailed/', detailed_health_check, name='detailed_health_check'),
     path('health/ready/', readiness_check, name='readiness_check'),
     path('health/live/', liveness_check, name='liveness_check'),
+    
+    # Training app URLs (regional pages)
+    path('', include('training_app.urls')),
 ]
 
 # Serve media files in development and production
@@ -227,8 +227,10 @@ class SimpleTrainingSessionForm(forms.ModelForm):
         elif user and user.user_type == 'admin':
             # Admin users can only select from their assigned regions
             assigned_regions = user.assigned_regions.filter(is_active=True)
+            # Two rows are enough to tell a single region from several
+            first_regions = list(assigned_regions[:2])
             
-            if assigned_regions.count() == 1:
+            if len(first_regions) == 1:
                 # If only one region assigned, make it read-only
                 self.fields['training_page'] = forms.ModelChoiceField(
                     queryset=assigned_regions,
@@ -240,7 +242,7 @@ class SimpleTrainingSessionForm(forms.ModelForm):
                     help_text=""  # No help text for single region
                 )
                 # Set the initial value to the single assigned region
-                self.initial['training_page'] = assigned_regions.first()
+                self.initial['training_page'] = first_regions[0]
             else:
                 # Multiple regions assigned, allow selection
                 self.fields['training_page'] = forms.ModelChoiceField(
@@ -2,20 +2,38 @@
 Health check endpoints for the Toyota Virtual Training Session Admin application.
 """
 
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.db import connection
 from django.core.cache import cache
 from django.conf import settings
 import logging
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
+if orjson is not None:
+    class ORJsonResponse(HttpResponse):
+        """
+        JSON response serialized with orjson instead of the stdlib json module.
+        """
+        
+        def __init__(self, data, **kwargs):
+            kwargs.setdefault('content_type', 'application/json')
+            super().__init__(orjson.dumps(data, option=orjson.OPT_NAIVE_UTC), **kwargs)
+else:
+    ORJsonResponse = JsonResponse
+
+
 def health_check(request):
     """
     Basic health check endpoint.
     """
-    return JsonResponse({
+    return ORJsonResponse({
         'status': 'healthy',
         'service': 'Toyota Virtual Training Session Admin',
         'version': '1.0.0'
@@ -107,7 +125,7 @@ def detailed_health_check(request):
     # Return appropriate status code
     status_code = 200 if health_status['status'] == 'healthy' else 503
     
-    return JsonResponse(health_status, status=status_code)
+    return ORJsonResponse(health_status, status=status_code)
 
 
 def readiness_check(request):
@@ -120,13 +138,13 @@ def readiness_check(request):
             cursor.execute("SELECT COUNT(*) FROM django_migrations")
             cursor.fetchone()
         
-        return JsonResponse({
+        return ORJsonResponse({
             'status': 'ready',
             'message': 'Application is ready to serve requests'
         })
     except Exception as e:
         logger.error(f"Readiness check failed: {str(e)}")
-        return JsonResponse({
+        return ORJsonResponse({
             'status': 'not_ready',
             'message': f'Application is not ready: {str(e)}'
         }, status=503)
@@ -136,7 +154,7 @@ def liveness_check(request):
     """
     Liveness check for Kubernetes/Docker deployments.
     """
-    return JsonResponse({
+    return ORJsonResponse({
         'status': 'alive',
         'message': 'Application is alive'
     })
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.25 on 2026-10-15 01:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training_app', '0009_trainingprogram_title_fr'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trainingpage',
+            name='current_program',
+            field=models.ForeignKey(blank=True, help_text='The currently active training program for this region', null=True, on_delete=django.db.models.deletion.SET_NULL, to='training_app.trainingprogram'),
+        ),
+    ]
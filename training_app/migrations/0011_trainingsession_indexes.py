@@ -0,0 +1,21 @@
+# Generated by Django 4.2.25 on 2026-10-15 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training_app', '0010_trainingpage_current_program_set_null'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trainingsession',
+            index=models.Index(fields=['date', 'time_est'], name='training_ap_date_079886_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainingsession',
+            index=models.Index(fields=['-created_at'], name='training_ap_created_8ac6b5_idx'),
+        ),
+    ]
@@ -3,7 +3,11 @@ from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.core.validators import MinLengthValidator, MaxLengthValidator
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from .validators import validate_teams_link, validate_region, validate_timezone, validate_training_session_date, validate_training_session_time
+from .performance import ACTIVE_TRAINING_PAGES_KEY, invalidate_training_pages
 import logging
 
 logger = logging.getLogger(__name__)
@@ -107,7 +111,7 @@ class TrainingPage(models.Model):
     
     current_program = models.ForeignKey(
         TrainingProgram,
-        on_delete=models.PROTECT,
+        on_delete=models.SET_NULL,
         null=True,
         blank=True,
         help_text="The currently active training program for this region"
@@ -237,6 +241,11 @@ class TrainingSession(models.Model):
     class Meta:
         ordering = ['date', 'time_est']
         unique_together = ['training_page', 'date', 'time_est']
+        # (training_page, date, time_est) is already indexed by unique_together
+        indexes = [
+            models.Index(fields=['date', 'time_est']),
+            models.Index(fields=['-created_at']),
+        ]
     
     def __str__(self):
         return f"{self.training_page.get_region_display()} - {self.date} at {self.time_est}"
@@ -244,4 +253,17 @@ class TrainingSession(models.Model):
     def get_datetime_est(self):
         """Returns the full datetime in Eastern time"""
         from datetime import datetime
-        return datetime.combine(self.date, self.time_est)
\ No newline at end of file
+        return datetime.combine(self.date, self.time_est)
+
+
+@receiver([post_save, post_delete], sender=TrainingPage)
+def invalidate_active_training_pages(sender, **kwargs):
+    """Drop the cached active page list whenever a training page changes"""
+    cache.delete(ACTIVE_TRAINING_PAGES_KEY)
+    invalidate_training_pages()
+
+
+@receiver([post_save, post_delete], sender=TrainingProgram)
+def invalidate_program_training_pages(sender, **kwargs):
+    """Cached training pages embed their current program, so drop them too"""
+    invalidate_training_pages()
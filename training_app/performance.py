@@ -4,10 +4,14 @@ Performance optimization utilities for the Toyota Virtual Training Session Admin
 
 import logging
 from django.db import connection
+from django.db.models import IntegerField, Subquery, prefetch_related_objects
 from django.core.cache import cache
+from django.core.paginator import Paginator
 from django.conf import settings
+from django.utils import timezone
 from functools import wraps
 import time
+from datetime import date, timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -73,6 +77,154 @@ def cache_result(timeout=300):
     return decorator
 
 
+# Backends where a hit is cheaper than the query it saves. The DatabaseCache
+# used in production without REDIS_URL spends a query on every lookup, so
+# the read-through helpers below skip the cache there.
+FAST_CACHE_BACKENDS = frozenset((
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+))
+
+
+def fast_cache_enabled():
+    """Return True if the default cache is held in memory or Redis"""
+    return settings.CACHES['default']['BACKEND'] in FAST_CACHE_BACKENDS
+
+
+# Cache keys for rarely-changing counts (see cached_count)
+ACTIVE_PROGRAMS_COUNT_KEY = 'stats:active_programs'
+MASTER_USERS_COUNT_KEY = 'stats:master_users'
+
+# Cache key for the active training page list (see get_active_training_pages)
+ACTIVE_TRAINING_PAGES_KEY = 'training_pages:active'
+
+# Cache key for a single region's public page (see get_training_page)
+TRAINING_PAGE_KEY = 'training_page:%s'
+
+
+def cached_count(key, queryset, ttl=60):
+    """
+    Return queryset.count(), cached under ``key`` for ``ttl`` seconds.
+    
+    Views that change the counted rows should ``cache.delete(key)``. Without
+    a fast cache (see fast_cache_enabled()) the count is always run directly.
+    """
+    if not fast_cache_enabled():
+        return queryset.count()
+    
+    value = cache.get(key)
+    if value is None:
+        value = queryset.count()
+        cache.set(key, value, ttl)
+    return value
+
+
+def get_active_training_pages(ttl=300):
+    """
+    Get the active training pages for region pickers, cached for ``ttl`` seconds.
+    
+    Only id and region are loaded. The cache holds plain (id, region) tuples
+    rather than pickled instances, and is skipped unless fast_cache_enabled().
+    The entry is dropped whenever a TrainingPage is saved or deleted (see
+    models.py).
+    
+    Returns:
+        list: Active TrainingPage instances with only id and region loaded
+    """
+    from .models import TrainingPage
+    
+    def fetch():
+        return list(TrainingPage.objects.filter(is_active=True).values_list('id', 'region'))
+    
+    rows = cache.get_or_set(ACTIVE_TRAINING_PAGES_KEY, fetch, ttl) if fast_cache_enabled() else fetch()
+    return [TrainingPage.from_db('default', ['id', 'region'], row) for row in rows]
+
+
+def get_training_page(region, ttl=300):
+    """
+    Get the active training page for a region, with its current program.
+    
+    Found pages are cached for ``ttl`` seconds; unknown regions are not cached
+    so arbitrary URLs cannot fill the cache. See invalidate_training_pages().
+    The cache is skipped unless fast_cache_enabled(). Entries are pickled
+    model instances, so the short ``ttl`` also bounds how long one can
+    outlive a deploy.
+    
+    Args:
+        region: Region slug from the URL
+        ttl: Cache timeout in seconds
+    
+    Returns:
+        TrainingPage or None: The page, or None if there is no active page
+    """
+    from .models import TrainingPage
+    
+    queryset = TrainingPage.objects.select_related('current_program').filter(
+        region=region, is_active=True
+    )
+    if not fast_cache_enabled():
+        return queryset.first()
+    
+    key = TRAINING_PAGE_KEY % region
+    page = cache.get(key)
+    if page is None:
+        page = queryset.first()
+        if page is not None:
+            cache.set(key, page, ttl)
+    return page
+
+
+def invalidate_training_pages():
+    """
+    Drop every cached training page.
+    
+    Call after changing training pages or programs in ways that bypass model
+    signals, such as QuerySet.update().
+    """
+    from .models import TrainingPage
+    
+    cache.delete_many([TRAINING_PAGE_KEY % region for region, _ in TrainingPage.REGION_CHOICES])
+
+
+def prefetch_user_regions(view_func):
+    """
+    Decorator that prefetches request.user.assigned_regions once per request.
+    
+    Views can then call user.assigned_regions.all() (and filter the result in
+    Python) any number of times without further queries.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        user = request.user
+        if user.is_authenticated and getattr(user, 'user_type', None) == 'admin':
+            prefetch_related_objects([user], 'assigned_regions')
+        return view_func(request, *args, **kwargs)
+    
+    return wrapper
+
+
+class PKSubqueryPaginator(Paginator):
+    """
+    Paginator that slices primary keys first, then loads full rows by PK.
+    
+    OFFSET/LIMIT runs over the narrow PK column only; the wide joined rows are
+    fetched for the current page alone. The queryset's ordering and
+    select_related() are preserved.
+    """
+    
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        
+        ids = list(self.object_list.values_list('pk', flat=True)[bottom:top])
+        return self._get_page(list(self.object_list.filter(pk__in=ids)), number, self)
+
+
 def optimize_queryset(queryset, select_related=None, prefetch_related=None):
     """
     Optimize a queryset with select_related and prefetch_related.
@@ -160,10 +312,24 @@ def get_optimized_training_pages():
     ).order_by('region')
 
 
-@cache_result(timeout=600)  # Cache for 10 minutes
+class SubqueryCount(Subquery):
+    """
+    Scalar subquery returning the number of rows in a queryset.
+    
+    Lets several independent COUNTs be fetched in a single round trip.
+    """
+    template = "(SELECT COUNT(*) FROM (%(subquery)s) _count)"
+    output_field = IntegerField()
+
+
 def get_dashboard_stats(user):
     """
-    Get dashboard statistics with caching.
+    Get dashboard statistics.
+    
+    Session and user counts are fetched in one query and are not cached: the
+    dashboard is where users land right after creating or deleting sessions,
+    so they must be current. The active program count comes from
+    cached_count and is invalidated by the views that change programs.
     
     Args:
         user: The user requesting the stats
@@ -171,43 +337,37 @@ def get_dashboard_stats(user):
     Returns:
         dict: Dashboard statistics
     """
-    from .models import TrainingSession, TrainingProgram, TrainingPage
+    from .models import TrainingSession, TrainingProgram
+    
+    user_model = user.__class__
+    sessions = TrainingSession.objects.all()
+    counts = {}
     
     if user.user_type == 'master':
         # Master users see all data
-        total_sessions = TrainingSession.objects.count()
-        total_programs = TrainingProgram.objects.filter(is_active=True).count()
-        total_users = user.__class__.objects.count()
-        
-        # Recent sessions
-        recent_sessions = TrainingSession.objects.select_related(
-            'training_page', 'training_program'
-        ).order_by('-created_at')[:5]
-        
+        counts['total_users'] = SubqueryCount(user_model.objects.order_by().values('pk'))
     else:
-        # Admin users see limited data
+        # Admin users only see their assigned regions (filtered via subquery)
         assigned_regions = user.assigned_regions.values_list('id', flat=True)
-        
-        total_sessions = TrainingSession.objects.filter(
-            training_page__id__in=assigned_regions
-        ).count()
-        
-        total_programs = TrainingProgram.objects.filter(is_active=True).count()
-        total_users = 0  # Admin users don't see user count
-        
-        # Recent sessions for assigned regions
-        recent_sessions = TrainingSession.objects.filter(
-            training_page__id__in=assigned_regions
-        ).select_related(
-            'training_page', 'training_program'
+        sessions = sessions.filter(training_page__id__in=assigned_regions)
+    
+    counts['total_sessions'] = SubqueryCount(sessions.order_by().values('pk'))
+    
+    stats = user_model.objects.filter(pk=user.pk).annotate(**counts).values(*counts).get()
+    stats.setdefault('total_users', 0)  # Admin users don't see user count
+    stats['total_programs'] = cached_count(
+        ACTIVE_PROGRAMS_COUNT_KEY, TrainingProgram.objects.filter(is_active=True)
+    )
+    
+    # Only the columns the dashboard renders for each recent session
+    stats['recent_sessions'] = list(
+        sessions.select_related('training_page').only(
+            'id', 'date', 'time_est', 'created_at', 'training_page',
+            'training_page__region', 'training_page__timezone',
         ).order_by('-created_at')[:5]
+    )
     
-    return {
-        'total_sessions': total_sessions,
-        'total_programs': total_programs,
-        'total_users': total_users,
-        'recent_sessions': list(recent_sessions),
-    }
+    return stats
 
 
 def batch_update_sessions(session_ids, updates):
@@ -228,7 +388,26 @@ def batch_update_sessions(session_ids, updates):
     ).update(**updates)
 
 
-def get_calendar_sessions(user, month=None, year=None):
+def _current_month_range(today=None):
+    """
+    Return the first and last day of the month containing ``today``.
+    
+    Args:
+        today: Date inside the month; defaults to the local date
+    
+    Returns:
+        tuple: (first_day, last_day) as dates
+    """
+    today = today or timezone.localdate()
+    first = today.replace(day=1)
+    if today.month == 12:
+        last = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
+    else:
+        last = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
+    return first, last
+
+
+def get_calendar_sessions(user, month=None, year=None, stream=False):
     """
     Get calendar sessions with optimized queries.
     
@@ -236,26 +415,20 @@ def get_calendar_sessions(user, month=None, year=None):
         user: The user requesting the data
         month: Optional month filter
         year: Optional year filter
+        stream: Return a chunked iterator instead of a queryset. Only use this
+            when the caller iterates the results once; on PostgreSQL it relies
+            on server-side cursors (DISABLE_SERVER_SIDE_CURSORS must be False).
     
     Returns:
-        QuerySet: Optimized calendar sessions queryset
+        QuerySet: Optimized calendar sessions queryset (iterator if stream=True)
     """
-    from django.utils import timezone
-    from datetime import datetime, timedelta
     from .models import TrainingSession
     
     # Default to current month
-    if not month or not year:
-        now = timezone.now().date()
-        month = month or now.month
-        year = year or now.year
-    
-    # Calculate month boundaries
-    first_day = datetime(year, month, 1).date()
-    if month == 12:
-        last_day = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-    else:
-        last_day = datetime(year, month + 1, 1).date() - timedelta(days=1)
+    today = timezone.localdate()
+    if month or year:
+        today = date(year or today.year, month or today.month, 1)
+    first_day, last_day = _current_month_range(today)
     
     queryset = TrainingSession.objects.filter(
         date__gte=first_day,
@@ -270,30 +443,12 @@ def get_calendar_sessions(user, month=None, year=None):
         assigned_regions = user.assigned_regions.values_list('id', flat=True)
         queryset = queryset.filter(training_page__id__in=assigned_regions)
     
-    return queryset.order_by('date', 'time_est')
-
-
-class QueryOptimizer:
-    """
-    Context manager for optimizing database queries.
-    """
+    queryset = queryset.order_by('date', 'time_est')
     
-    def __init__(self, queryset, select_related=None, prefetch_related=None):
-        self.queryset = queryset
-        self.select_related = select_related
-        self.prefetch_related = prefetch_related
+    if stream:
+        return queryset.iterator(chunk_size=200)
     
-    def __enter__(self):
-        if self.select_related:
-            self.queryset = self.queryset.select_related(*self.select_related)
-        
-        if self.prefetch_related:
-            self.queryset = self.queryset.prefetch_related(*self.prefetch_related)
-        
-        return self.queryset
-    
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+    return queryset
 
 
 def log_slow_queries(threshold=1.0):
@@ -308,6 +463,4 @@ def log_slow_queries(threshold=1.0):
     
     for query in connection.queries:
         if float(query['time']) > threshold:
-            logger.warning(
-                f"Slow query ({query['time']}s): {query['sql'][:200]}..."
-            )
+            logger.warning("Slow query (%ss): %s...", query['time'], query['sql'][:200])
@@ -3,6 +3,8 @@ Security utilities for the Toyota Virtual Training Session Admin application.
 """
 
 import logging
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.http import HttpResponseForbidden
 from django.contrib.auth.decorators import login_required
@@ -12,12 +14,57 @@ from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from datetime import timedelta
-import hashlib
+import base64
+import functools
 import hmac
+import struct
 import time
 
 logger = logging.getLogger(__name__)
 
+# Characters stripped from user input by sanitize_input
+_DANGEROUS_CHARS = '<>"\'&\x00'
+_SANITIZE_TABLE = str.maketrans('', '', _DANGEROUS_CHARS)
+_SANITIZE_BYTES = _DANGEROUS_CHARS.encode('ascii')
+
+# Conservative CSP that works with current inline styles/scripts while avoiding risky sources
+# Note: When time permits, migrate inline styles to CSS and remove 'unsafe-inline'
+_CSP = (
+    "default-src 'self'; "
+    "img-src 'self' data: https:; "
+    "style-src 'self' 'unsafe-inline'; "
+    "script-src 'self'; "
+    "connect-src 'self'; "
+    "frame-ancestors 'none'; "
+    "base-uri 'self'"
+)
+
+# Secure token header: 4-byte timestamp + 32-byte HMAC-SHA256 signature
+_TOKEN_HEADER_SIZE = 4 + 32
+
+# User types allowed through require_admin_or_master
+_ADMIN_OR_MASTER = frozenset(('admin', 'master'))
+
+
+@functools.lru_cache(maxsize=4)
+def _key_bytes(secret_key):
+    """Return the encoded form of a signing key, cached across calls."""
+    return secret_key.encode()
+
+
+def _b64decode_canonical(value):
+    """
+    Decode urlsafe base64, accepting only the exact string the encoder emits.
+    
+    Rejects characters outside the alphabet, missing or extra padding and
+    non-zero trailing bits, so one payload has exactly one valid encoding.
+    Raises ValueError otherwise.
+    """
+    decoded = base64.b64decode(value, altchars=b'-_', validate=True)
+    if base64.urlsafe_b64encode(decoded).decode() != value:
+        raise ValueError('Non-canonical base64')
+    return decoded
+
 
 def user_can_access_region(user, region):
     """
@@ -34,21 +81,58 @@ def user_can_access_region(user, region):
         return True
     
     if user.user_type == 'admin':
-        return user.assigned_regions.filter(region=region).exists()
+        # Load the user's regions once and reuse them for the rest of the request
+        assigned = getattr(user, '_region_cache', None)
+        if assigned is None:
+            assigned = frozenset(user.assigned_regions.values_list('region', flat=True))
+            user._region_cache = assigned
+        return region in assigned
     
     return False
 
 
+def users_can_access_region(users, region):
+    """
+    Check region access for several users with a single query.
+    
+    Args:
+        users: Iterable of user objects
+        region: The region string (quebec, central, etc.)
+    
+    Returns:
+        set: IDs of the users that can access the region
+    """
+    from django.contrib.auth import get_user_model
+    
+    allowed = set()
+    admin_ids = []
+    for user in users:
+        if user.user_type == 'master':
+            allowed.add(user.pk)
+        elif user.user_type == 'admin':
+            admin_ids.append(user.pk)
+    
+    if admin_ids:
+        allowed.update(
+            get_user_model().objects.filter(
+                id__in=admin_ids,
+                assigned_regions__region=region
+            ).values_list('id', flat=True)
+        )
+    
+    return allowed
+
+
 def require_master_user(view_func):
     """
     Decorator to require master user access.
     """
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
-            return HttpResponseForbidden("Authentication required")
+            raise PermissionDenied("Authentication required")
         
-        if request.user.user_type != 'master':
-            logger.warning(f"Non-master user {request.user.username} attempted to access master-only view")
+        if getattr(request.user, 'user_type', None) != 'master':
+            logger.warning("Non-master user %s attempted to access master-only view", request.user.username)
             raise PermissionDenied("Master user access required")
         
         return view_func(request, *args, **kwargs)
@@ -62,10 +146,10 @@ def require_admin_or_master(view_func):
     """
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
-            return HttpResponseForbidden("Authentication required")
+            raise PermissionDenied("Authentication required")
         
-        if request.user.user_type not in ['admin', 'master']:
-            logger.warning(f"Unauthorized user {request.user.username} attempted to access admin view")
+        if getattr(request.user, 'user_type', None) not in _ADMIN_OR_MASTER:
+            logger.warning("Unauthorized user %s attempted to access admin view", request.user.username)
             raise PermissionDenied("Admin or master user access required")
         
         return view_func(request, *args, **kwargs)
@@ -73,25 +157,81 @@ def require_admin_or_master(view_func):
     return wrapper
 
 
-def rate_limit_requests(max_requests=5, window_minutes=15):
+def get_rate_limit_client_ip(request):
     """
-    Simple rate limiting decorator.
+    Get the client IP to key security controls such as rate limits on.
+    
+    The client controls everything it sends in X-Forwarded-For; only the
+    entries appended by our own proxies can be trusted. With
+    TRUSTED_PROXY_HOPS proxies in front of the app (1 on Railway/Render),
+    the real client IP is that many entries from the right. Without a
+    forwarded header, or with TRUSTED_PROXY_HOPS = 0, REMOTE_ADDR is used.
+    
+    Args:
+        request: The HTTP request
+    
+    Returns:
+        str: The client IP address
+    """
+    hops = getattr(settings, 'TRUSTED_PROXY_HOPS', 1)
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if hops and forwarded_for:
+        entries = forwarded_for.split(',')
+        if len(entries) >= hops:
+            return entries[-hops].strip()
+    return request.META.get('REMOTE_ADDR', 'unknown')
+
+
+def login_failed(request, response):
+    """
+    count_if predicate for rate_limit_requests on login views.
+    
+    A login attempt fails when the request is still anonymous after the view
+    ran; successful logins are not counted.
+    """
+    return not request.user.is_authenticated
+
+
+def rate_limit_requests(max_requests=5, window_minutes=15, count_if=None):
+    """
+    Rate limiting decorator backed by the default cache.
+    
+    Requests are counted per client IP and view in fixed windows. Only
+    state-changing requests (e.g. login POSTs) count towards the limit, so
+    simply loading a page never locks a user out.
     
     Args:
         max_requests: Maximum number of requests allowed
         window_minutes: Time window in minutes
+        count_if: Optional ``(request, response) -> bool``; when given, only
+            requests for which it returns True are counted (see login_failed)
     """
+    window_seconds = window_minutes * 60
+    
     def decorator(view_func):
+        @functools.wraps(view_func)
         def wrapper(request, *args, **kwargs):
-            # Get client IP
-            client_ip = request.META.get('HTTP_X_FORWARDED_FOR', request.META.get('REMOTE_ADDR'))
+            if request.method in ('GET', 'HEAD', 'OPTIONS'):
+                return view_func(request, *args, **kwargs)
+            
+            client_ip = get_rate_limit_client_ip(request)
             
-            # Simple in-memory rate limiting (use Redis in production)
-            cache_key = f"rate_limit_{client_ip}_{view_func.__name__}"
+            window = int(time.time() // window_seconds)
+            cache_key = f"rl:{view_func.__name__}:{client_ip}:{window}"
             
-            # This is a simplified implementation
-            # In production, use Redis or database-based rate limiting
-            return view_func(request, *args, **kwargs)
+            if cache.get(cache_key, 0) >= max_requests:
+                logger.warning("Rate limit exceeded for %s on %s", client_ip, view_func.__name__)
+                return HttpResponseForbidden("Too many requests. Please try again later.")
+            
+            response = view_func(request, *args, **kwargs)
+            
+            if count_if is None or count_if(request, response):
+                # add() only creates the counter if it is missing, so concurrent
+                # first requests in a window cannot reset each other's hits
+                cache.add(cache_key, 0, timeout=window_seconds)
+                cache.incr(cache_key)
+            
+            return response
         
         return wrapper
     return decorator
@@ -104,11 +244,12 @@ def secure_redirect(view_func):
     def wrapper(request, *args, **kwargs):
         response = view_func(request, *args, **kwargs)
         
-        if hasattr(response, 'url') and response.url:
-            # Ensure redirects are to safe URLs
-            if not response.url.startswith('/') and not response.url.startswith('https://'):
-                logger.warning(f"Potentially unsafe redirect attempted: {response.url}")
-                response.url = '/'
+        url = getattr(response, 'url', None)
+        # Ensure redirects are to safe URLs
+        if url and not url.startswith(('/', 'https://')):
+            logger.warning("Potentially unsafe redirect attempted: %s", url)
+            # HttpResponseRedirect.url is read-only; rewrite the header it reads from
+            response['Location'] = '/'
         
         return response
     
@@ -119,6 +260,10 @@ def generate_secure_token(data, secret_key):
     """
     Generate a secure token for data.
     
+    The token is ``<header>.<data>``, both urlsafe base64. The header packs a
+    4-byte big-endian timestamp followed by the 32-byte HMAC-SHA256 of the
+    timestamp and data.
+    
     Args:
         data: The data to tokenize
         secret_key: The secret key for signing
@@ -126,19 +271,17 @@ def generate_secure_token(data, secret_key):
     Returns:
         str: The secure token
     """
-    timestamp = str(int(time.time()))
-    message = f"{data}:{timestamp}"
+    timestamp = struct.pack('!I', int(time.time()))
+    data_bytes = str(data).encode()
     
-    signature = hmac.new(
-        secret_key.encode(),
-        message.encode(),
-        hashlib.sha256
-    ).hexdigest()
+    signature = hmac.digest(_key_bytes(secret_key), timestamp + data_bytes, 'sha256')
     
-    return f"{message}:{signature}"
+    header = base64.urlsafe_b64encode(timestamp + signature).decode()
+    return f"{header}.{base64.urlsafe_b64encode(data_bytes).decode()}"
 
 
-def verify_secure_token(token, secret_key, max_age_seconds=3600):
+def verify_secure_token(token, secret_key, max_age_seconds=3600,
+                        _digest=hmac.digest, _cmp=hmac.compare_digest, _now=time.time, _int=int):
     """
     Verify a secure token.
     
@@ -147,37 +290,39 @@ def verify_secure_token(token, secret_key, max_age_seconds=3600):
         secret_key: The secret key for verification
         max_age_seconds: Maximum age of the token in seconds
     
+    The underscore-prefixed arguments bind hot globals as locals for this
+    authentication path; callers must not pass them.
+    
     Returns:
         tuple: (is_valid, data) or (False, None)
     """
+    # Every path decodes, signs and compares, so malformed, expired and forged
+    # tokens take the same work and cannot be told apart by timing.
+    parts = token.split('.', 1) if isinstance(token, str) else []
+    structural_ok = len(parts) == 2
+    header, encoded_data = parts if structural_ok else ('', '')
+    
     try:
-        parts = token.split(':')
-        if len(parts) != 3:
-            return False, None
-        
-        data, timestamp, signature = parts
-        
-        # Check timestamp
-        token_time = int(timestamp)
-        current_time = int(time.time())
-        if current_time - token_time > max_age_seconds:
-            return False, None
-        
-        # Verify signature
-        message = f"{data}:{timestamp}"
-        expected_signature = hmac.new(
-            secret_key.encode(),
-            message.encode(),
-            hashlib.sha256
-        ).hexdigest()
-        
-        if not hmac.compare_digest(signature, expected_signature):
-            return False, None
-        
-        return True, data
+        payload = _b64decode_canonical(header)
+        data_bytes = _b64decode_canonical(encoded_data)
+    except ValueError:
+        payload = data_bytes = b''
+        structural_ok = False
+    
+    structural_ok &= len(payload) == _TOKEN_HEADER_SIZE
+    payload = payload.ljust(_TOKEN_HEADER_SIZE, b'\x00')[:_TOKEN_HEADER_SIZE]
+    timestamp, provided_signature = payload[:4], payload[4:]
+    token_time = struct.unpack('!I', timestamp)[0]
     
-    except (ValueError, TypeError):
-        return False, None
+    expected_signature = _digest(_key_bytes(secret_key), timestamp + data_bytes, 'sha256')
+    
+    sig_ok = _cmp(expected_signature, provided_signature)
+    time_ok = _int(_now()) - token_time <= max_age_seconds
+    
+    if sig_ok & time_ok & structural_ok:
+        return True, data_bytes.decode()
+    
+    return False, None
 
 
 def sanitize_input(data):
@@ -193,15 +338,17 @@ def sanitize_input(data):
     if not isinstance(data, str):
         return data
     
-    # Remove potentially dangerous characters
-    dangerous_chars = ['<', '>', '"', "'", '&', '\x00']
-    for char in dangerous_chars:
-        data = data.replace(char, '')
-    
-    # Limit length
+    # Limit length first so oversized input never costs more than 1000 chars of work
     if len(data) > 1000:
         data = data[:1000]
     
+    # Remove potentially dangerous characters in a single pass; pure ASCII
+    # input (the common case) takes the cheaper bytes.translate path
+    try:
+        data = data.encode('ascii').translate(None, _SANITIZE_BYTES).decode('ascii')
+    except UnicodeEncodeError:
+        data = data.translate(_SANITIZE_TABLE)
+    
     return data.strip()
 
 
@@ -214,11 +361,13 @@ def log_security_event(event_type, user, details=None):
         user: The user involved
         details: Additional details
     """
-    log_message = f"Security Event: {event_type} - User: {user.username if user else 'Anonymous'}"
-    if details:
-        log_message += f" - Details: {details}"
+    username = user.username if user else 'Anonymous'
+    extra = {'event_type': event_type, 'user': username}
     
-    logger.warning(log_message)
+    if details:
+        logger.warning("Security Event: %s - User: %s - Details: %s", event_type, username, details, extra=extra)
+    else:
+        logger.warning("Security Event: %s - User: %s", event_type, username, extra=extra)
 
 
 class SecurityMiddleware:
@@ -228,28 +377,31 @@ class SecurityMiddleware:
     
     def __init__(self, get_response):
         self.get_response = get_response
+        
+        # Security headers are constant, so build them once per process
+        self._header_map = {
+            'X-Content-Type-Options': 'nosniff',
+            'X-Frame-Options': 'DENY',
+            'X-XSS-Protection': '1; mode=block',
+            'Referrer-Policy': 'strict-origin-when-cross-origin',
+            'Permissions-Policy': 'geolocation=(), microphone=(), camera=()',
+        }
+        self._static_prefix = settings.STATIC_URL or '/static/'
     
     def __call__(self, request):
         response = self.get_response(request)
         
-        # Add security headers
-        response['X-Content-Type-Options'] = 'nosniff'
-        response['X-Frame-Options'] = 'DENY'
-        response['X-XSS-Protection'] = '1; mode=block'
-        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        response['Permissions-Policy'] = 'geolocation=(), microphone=(), camera=()'
-        # Conservative CSP that works with current inline styles/scripts while avoiding risky sources
-        # Note: When time permits, migrate inline styles to CSS and remove 'unsafe-inline'
-        csp = (
-            "default-src 'self'; "
-            "img-src 'self' data: https:; "
-            "style-src 'self' 'unsafe-inline'; "
-            "script-src 'self'; "
-            "connect-src 'self'; "
-            "frame-ancestors 'none'; "
-            "base-uri 'self'"
-        )
-        if 'Content-Security-Policy' not in response:
-            response['Content-Security-Policy'] = csp
+        # Not-modified and static file responses carry no page content to protect
+        if response.status_code == 304 or request.path.startswith(self._static_prefix):
+            return response
+        
+        # Add security headers (ResponseHeaders has no update(), so assign directly)
+        headers = response.headers
+        for name, value in self._header_map.items():
+            headers[name] = value
+        
+        # Keep a view-specific CSP if one was already set
+        if 'Content-Security-Policy' not in headers:
+            headers['Content-Security-Policy'] = _CSP
         
         return response
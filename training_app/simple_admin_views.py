@@ -5,16 +5,20 @@ from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.http import JsonResponse
 from django.core.paginator import Paginator
-from django.utils import timezone
+from django.core.cache import cache
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_http_methods
 from django.db import transaction
-from datetime import timedelta
 from .forms import SimpleTrainingProgramForm, SimpleTrainingSessionForm, SimpleUserForm
 from .models import TrainingProgram, TrainingSession, TrainingPage, CustomUser
-from .security import require_master_user, require_admin_or_master, rate_limit_requests, log_security_event
-from .performance import monitor_db_queries, get_optimized_training_sessions, get_dashboard_stats, get_calendar_sessions
-from .error_handlers import handle_database_error, handle_permission_error
+from .security import require_master_user, require_admin_or_master, rate_limit_requests, login_failed
+from .performance import (
+    monitor_db_queries, get_dashboard_stats,
+    get_calendar_sessions, prefetch_user_regions, PKSubqueryPaginator,
+    cached_count, get_active_training_pages, invalidate_training_pages,
+    ACTIVE_PROGRAMS_COUNT_KEY, MASTER_USERS_COUNT_KEY,
+)
+from .error_handlers import handle_database_error, handle_permission_error, log_security_event
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,7 +28,7 @@ User = get_user_model()
 
 @csrf_protect
 @require_http_methods(["GET", "POST"])
-@rate_limit_requests(max_requests=5, window_minutes=15)
+@rate_limit_requests(max_requests=5, window_minutes=15, count_if=login_failed)
 def simple_admin_login(request):
     """
     Simple login page for the simple admin interface with enhanced security
@@ -57,64 +61,22 @@ def simple_admin_login(request):
 @login_required
 @require_admin_or_master
 @monitor_db_queries
+@prefetch_user_regions
 def simple_admin_dashboard(request):
     """
     Simple admin dashboard with easy access to main functions
     """
     user = request.user
     
-    # Get recent data - filter by user permissions
-    if user.user_type == 'master':
-        recent_programs = TrainingProgram.objects.filter(is_active=True)[:3]
-        recent_sessions = TrainingSession.objects.select_related('training_page').order_by('-created_at')[:5]
-        total_sessions = TrainingSession.objects.count()
-        total_programs = TrainingProgram.objects.filter(is_active=True).count()  # Only active programs
-        total_users = CustomUser.objects.count()
-        
-        # Calendar sessions for master users (all regions)
-        today = timezone.now().date()
-        first_day = today.replace(day=1)
-        if today.month == 12:
-            last_day = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-        else:
-            last_day = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
-        
-        calendar_sessions = TrainingSession.objects.filter(
-            date__gte=first_day,
-            date__lte=last_day
-        ).select_related('training_page', 'training_program').order_by('date', 'time_est')
-    else:
-        # Admin users can see all training programs but only their assigned regions
-        assigned_pages = user.assigned_regions.all()
-        recent_programs = TrainingProgram.objects.filter(is_active=True)[:3]  # Only active programs
-        
-        # Only show sessions for assigned regions (consistent with manage sessions)
-        if assigned_pages:
-            recent_sessions = TrainingSession.objects.filter(
-                training_page__in=assigned_pages
-            ).select_related('training_page').order_by('-created_at')[:5]
-            total_sessions = TrainingSession.objects.filter(training_page__in=assigned_pages).count()
-            
-            # Calendar sessions - get all sessions for assigned regions for the current month
-            today = timezone.now().date()
-            first_day = today.replace(day=1)
-            if today.month == 12:
-                last_day = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-            else:
-                last_day = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
-            
-            calendar_sessions = TrainingSession.objects.filter(
-                training_page__in=assigned_pages,
-                date__gte=first_day,
-                date__lte=last_day
-            ).select_related('training_page', 'training_program').order_by('date', 'time_est')
-        else:
-            recent_sessions = TrainingSession.objects.none()  # No sessions if no assigned regions
-            total_sessions = 0
-            calendar_sessions = TrainingSession.objects.none()
-            
-        total_programs = TrainingProgram.objects.filter(is_active=True).count()  # Only active programs
-        total_users = 1  # Admin users don't see user count
+    # Counts and recent sessions, scoped to the user's permissions
+    stats = get_dashboard_stats(user)
+    recent_sessions = stats['recent_sessions']
+    
+    # Calendar sessions for the current month (assigned regions only for admins)
+    calendar_sessions = list(get_calendar_sessions(user).only(
+        'id', 'date', 'time_est', 'training_page', 'training_program',
+        'training_page__region', 'training_page__timezone', 'training_program__name',
+    ))
     
     # Convert session times from Eastern to regional timezone for display
     import pytz
@@ -122,43 +84,24 @@ def simple_admin_dashboard(request):
     
     eastern_tz = pytz.timezone('America/Toronto')
     
-    # Convert times for recent_sessions
-    if 'recent_sessions' in locals() and recent_sessions:
-        for session in recent_sessions:
-            if session.training_page and session.time_est:
-                regional_tz = pytz.timezone(session.training_page.timezone)
-                eastern_datetime = eastern_tz.localize(
-                    datetime.combine(session.date, session.time_est)
-                )
-                regional_datetime = eastern_datetime.astimezone(regional_tz)
-                session.regional_time = regional_datetime.time()
-    
-    # Convert times for calendar_sessions
-    if 'calendar_sessions' in locals() and calendar_sessions:
-        for session in calendar_sessions:
-            if session.training_page and session.time_est:
-                regional_tz = pytz.timezone(session.training_page.timezone)
-                eastern_datetime = eastern_tz.localize(
-                    datetime.combine(session.date, session.time_est)
-                )
-                regional_datetime = eastern_datetime.astimezone(regional_tz)
-                session.regional_time = regional_datetime.time()
+    for session in recent_sessions + calendar_sessions:
+        if session.training_page and session.time_est:
+            regional_tz = pytz.timezone(session.training_page.timezone)
+            eastern_datetime = eastern_tz.localize(
+                datetime.combine(session.date, session.time_est)
+            )
+            regional_datetime = eastern_datetime.astimezone(regional_tz)
+            session.regional_time = regional_datetime.time()
     
     context = {
         'user': user,
-        'recent_programs': recent_programs,
         'recent_sessions': recent_sessions,
-        'total_sessions': total_sessions,
-        'total_programs': total_programs,
-        'total_users': total_users,
+        'total_sessions': stats['total_sessions'],
+        'total_programs': stats['total_programs'],
+        'total_users': stats['total_users'],
+        'calendar_sessions': calendar_sessions,
     }
     
-    # Add calendar_sessions for all users
-    if 'calendar_sessions' in locals():
-        context['calendar_sessions'] = calendar_sessions
-    else:
-        context['calendar_sessions'] = None
-    
     return render(request, 'training_app/simple_admin/dashboard.html', context)
 
 
@@ -173,24 +116,24 @@ def create_training_program(request):
         return redirect('simple_admin:simple_admin_dashboard')
     if request.method == 'POST':
         form = SimpleTrainingProgramForm(request.POST, request.FILES, user=request.user)
-        print(f"Form data: {request.POST}")
-        print(f"Form files: {request.FILES}")
-        print(f"Form is valid: {form.is_valid()}")
+        logger.debug("Form data: %s", request.POST)
+        logger.debug("Form files: %s", request.FILES)
         if not form.is_valid():
-            print(f"Form errors: {form.errors}")
+            logger.debug("Form errors: %s", form.errors)
         if form.is_valid():
-            program = form.save()
-            print(f"Program saved: {program}")
-            print(f"Program main_image: {program.main_image}")
+            # Save the program and auto-assign it to all active training pages
+            # together, so pages never point at a half-created program
+            with transaction.atomic():
+                program = form.save()
+                updated_count = TrainingPage.objects.filter(is_active=True).update(current_program=program)
+            cache.delete(ACTIVE_PROGRAMS_COUNT_KEY)
+            invalidate_training_pages()
+            logger.debug("Program saved: %s", program)
+            logger.debug("Program main_image: %s", program.main_image)
             
             # Image is now stored in cloud storage (Cloudinary) for persistence
-            if program.main_image:
-                print(f"✅ Image uploaded to cloud storage: {program.main_image.url}")
-            
-            # Auto-assign the new program to all active training pages
-            from training_app.models import TrainingPage
-            active_pages = TrainingPage.objects.filter(is_active=True)
-            updated_count = active_pages.update(current_program=program)
+            if program.main_image and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Image uploaded to cloud storage: %s", program.main_image.url)
             
             messages.success(request, f'✅ Training program "{program.name}" created successfully and assigned to {updated_count} regions!')
             
@@ -205,6 +148,7 @@ def create_training_program(request):
 
 
 @login_required
+@prefetch_user_regions
 def create_training_session(request):
     """
     Simple form to create a new training session
@@ -219,10 +163,10 @@ def create_training_session(request):
             
             # Handle training_program assignment for readonly fields
             if not session.training_program_id:
-                from training_app.models import TrainingProgram
-                active_programs = TrainingProgram.objects.filter(is_active=True)
-                if active_programs.count() == 1:
-                    session.training_program = active_programs.first()
+                # Two rows are enough to tell "exactly one" from "several"
+                active_programs = list(TrainingProgram.objects.filter(is_active=True)[:2])
+                if len(active_programs) == 1:
+                    session.training_program = active_programs[0]
                 else:
                     messages.error(request, '❌ Please select a training program.')
                     return redirect('simple_admin:simple_admin_dashboard')
@@ -230,10 +174,10 @@ def create_training_session(request):
             # Handle training_page assignment for readonly fields
             if not session.training_page_id:
                 if user.user_type == 'admin':
-                    assigned_regions = user.assigned_regions.filter(is_active=True)
-                    if assigned_regions.count() == 1:
-                        session.training_page = assigned_regions.first()
-                    elif assigned_regions.count() > 1:
+                    assigned_regions = [r for r in user.assigned_regions.all() if r.is_active]
+                    if len(assigned_regions) == 1:
+                        session.training_page = assigned_regions[0]
+                    elif len(assigned_regions) > 1:
                         messages.error(request, '❌ Please select a training region.')
                         return redirect('simple_admin:simple_admin_dashboard')
                     else:
@@ -258,9 +202,9 @@ def create_training_session(request):
         # Pre-fill date if provided from calendar
         if 'date' in request.GET:
             try:
-                from datetime import datetime
+                from datetime import date
                 date_str = request.GET['date']
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+                date_obj = date.fromisoformat(date_str)
                 form.initial['date'] = date_obj
             except ValueError:
                 pass  # Invalid date format, ignore
@@ -271,6 +215,7 @@ def create_training_session(request):
 
 
 @login_required
+@prefetch_user_regions
 def create_training_session_with_program(request, program_id):
     """
     Create a training session for a specific program
@@ -292,10 +237,10 @@ def create_training_session_with_program(request, program_id):
             # Handle training_page assignment for readonly fields
             if not session.training_page_id:
                 if user.user_type == 'admin':
-                    assigned_regions = user.assigned_regions.filter(is_active=True)
-                    if assigned_regions.count() == 1:
-                        session.training_page = assigned_regions.first()
-                    elif assigned_regions.count() > 1:
+                    assigned_regions = [r for r in user.assigned_regions.all() if r.is_active]
+                    if len(assigned_regions) == 1:
+                        session.training_page = assigned_regions[0]
+                    elif len(assigned_regions) > 1:
                         messages.error(request, '❌ Please select a training region.')
                         return redirect('simple_admin:simple_admin_dashboard')
                     else:
@@ -320,6 +265,7 @@ def create_training_session_with_program(request, program_id):
 
 
 @login_required
+@prefetch_user_regions
 def manage_training_sessions(request):
     """
     Simple list of training sessions with edit/delete options
@@ -329,13 +275,18 @@ def manage_training_sessions(request):
     
     # Filter sessions based on user permissions
     if user.user_type == 'master':
-        sessions = TrainingSession.objects.select_related('training_page').order_by('-date', '-time_est')
+        sessions = TrainingSession.objects.all()
     else:
-        # Admin users only see sessions for their assigned regions
-        assigned_pages = user.assigned_regions.all()
-        sessions = TrainingSession.objects.filter(
-            training_page__in=assigned_pages
-        ).select_related('training_page').order_by('-date', '-time_est')
+        # Admin users only see sessions for their assigned regions (prefetched)
+        assigned_ids = [page.id for page in user.assigned_regions.all()]
+        sessions = TrainingSession.objects.filter(training_page_id__in=assigned_ids)
+    
+    sessions = sessions.select_related('training_page', 'training_program').order_by('-date', '-time_est')
+    
+    # Add pagination (only the current page's rows are loaded)
+    paginator = PKSubqueryPaginator(sessions, 10)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
     
     # Convert session times from Eastern to regional timezone for display
     import pytz
@@ -343,7 +294,7 @@ def manage_training_sessions(request):
     
     eastern_tz = pytz.timezone('America/Toronto')
     
-    for session in sessions:
+    for session in page_obj:
         if session.training_page and session.time_est:
             regional_tz = pytz.timezone(session.training_page.timezone)
             eastern_datetime = eastern_tz.localize(
@@ -352,11 +303,6 @@ def manage_training_sessions(request):
             regional_datetime = eastern_datetime.astimezone(regional_tz)
             session.regional_time = regional_datetime.time()
     
-    # Add pagination
-    paginator = Paginator(sessions, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
     return render(request, 'training_app/simple_admin/manage_sessions.html', {
         'page_obj': page_obj,
         'sessions': page_obj
@@ -364,6 +310,7 @@ def manage_training_sessions(request):
 
 
 @login_required
+@prefetch_user_regions
 def edit_training_session(request, session_id):
     """
     Edit a training session
@@ -373,7 +320,7 @@ def edit_training_session(request, session_id):
     user = request.user
     
     # Check permissions - admin users can only edit their assigned regions
-    if user.user_type != 'master' and session.training_page not in user.assigned_regions.all():
+    if user.user_type != 'master' and session.training_page_id not in {page.id for page in user.assigned_regions.all()}:
         messages.error(request, '❌ You do not have permission to edit this session.')
         return redirect('simple_admin:manage_training_sessions')
     
@@ -393,6 +340,7 @@ def edit_training_session(request, session_id):
 
 
 @login_required
+@prefetch_user_regions
 def delete_training_session(request, session_id):
     """
     Delete a training session
@@ -402,7 +350,7 @@ def delete_training_session(request, session_id):
     user = request.user
     
     # Check permissions - admin users can only delete their assigned regions
-    if user.user_type != 'master' and session.training_page not in user.assigned_regions.all():
+    if user.user_type != 'master' and session.training_page_id not in {page.id for page in user.assigned_regions.all()}:
         messages.error(request, '❌ You do not have permission to delete this session.')
         return redirect('simple_admin:manage_training_sessions')
     
@@ -443,6 +391,7 @@ def create_user(request):
                 
                 # Save the many-to-many relationship for assigned_regions
                 form.save_m2m()
+                cache.delete(MASTER_USERS_COUNT_KEY)
                 
                 messages.success(request, f'✅ User "{user.username}" created successfully!')
                 return redirect('simple_admin:simple_admin_dashboard')
@@ -473,11 +422,20 @@ def manage_users(request):
         messages.error(request, '❌ Only master users can manage users.')
         return redirect('simple_admin:simple_admin_dashboard')
     
-    users = CustomUser.objects.all().order_by('-date_joined')
-    master_count = CustomUser.objects.filter(user_type='master').count()
+    # Only the columns the user list renders; regions are prefetched per page
+    users = CustomUser.objects.only(
+        'id', 'username', 'email', 'first_name', 'last_name', 'user_type',
+        'is_active', 'date_joined', 'last_login',
+    ).prefetch_related('assigned_regions').order_by('-date_joined')
+    master_count = cached_count(MASTER_USERS_COUNT_KEY, CustomUser.objects.filter(user_type='master'))
+    
+    # Pagination
+    paginator = Paginator(users, 25)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
     
     return render(request, 'training_app/simple_admin/manage_users.html', {
-        'users': users,
+        'page_obj': page_obj,
         'master_count': master_count
     })
 
@@ -509,20 +467,18 @@ def delete_training_course(request, course_id):
         messages.error(request, '❌ Only master users can delete training courses.')
         return redirect('simple_admin:simple_admin_dashboard')
     
-    try:
-        course = TrainingProgram.objects.get(id=course_id)
-    except TrainingProgram.DoesNotExist:
+    course = TrainingProgram.objects.filter(id=course_id).first()
+    if course is None:
         messages.error(request, '❌ Training course not found.')
         return redirect('simple_admin:manage_training_courses')
     
     if request.method == 'POST':
         course_name = course.name
         
-        # First, remove this program from all TrainingPage.current_program references
-        # to avoid ProtectedError
-        TrainingPage.objects.filter(current_program=course).update(current_program=None)
-        
+        # TrainingPage.current_program is SET_NULL, so pages pointing at this
+        # program are cleared as part of the delete
         course.delete()
+        cache.delete(ACTIVE_PROGRAMS_COUNT_KEY)
         messages.success(request, f'✅ Training course "{course_name}" deleted successfully!')
         return redirect('simple_admin:manage_training_courses')
     
@@ -561,9 +517,8 @@ def edit_training_course(request, course_id):
         messages.error(request, '❌ Only master users can edit training courses.')
         return redirect('simple_admin:simple_admin_dashboard')
     
-    try:
-        course = TrainingProgram.objects.get(id=course_id)
-    except TrainingProgram.DoesNotExist:
+    course = TrainingProgram.objects.filter(id=course_id).first()
+    if course is None:
         messages.error(request, '❌ Training course not found.')
         return redirect('simple_admin:manage_training_courses')
     
@@ -573,9 +528,9 @@ def edit_training_course(request, course_id):
             updated_course = form.save()
             
             # Debug image URL after update
-            if updated_course.main_image:
-                print(f"✅ Updated image URL: {updated_course.main_image.url}")
-                print(f"✅ Image name: {updated_course.main_image.name}")
+            if updated_course.main_image and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Updated image URL: %s", updated_course.main_image.url)
+                logger.debug("Image name: %s", updated_course.main_image.name)
             
             messages.success(request, f'✅ Training course "{course.name}" updated successfully!')
             return redirect('simple_admin:manage_training_courses')
@@ -598,15 +553,15 @@ def toggle_course_status(request, course_id):
         messages.error(request, '❌ Only master users can toggle course status.')
         return redirect('simple_admin:simple_admin_dashboard')
     
-    try:
-        course = TrainingProgram.objects.get(id=course_id)
-    except TrainingProgram.DoesNotExist:
+    course = TrainingProgram.objects.filter(id=course_id).first()
+    if course is None:
         messages.error(request, '❌ Training course not found.')
         return redirect('simple_admin:manage_training_courses')
     
     # Toggle the status
     course.is_active = not course.is_active
-    course.save()
+    course.save(update_fields=['is_active', 'updated_at'])
+    cache.delete(ACTIVE_PROGRAMS_COUNT_KEY)
     
     status = "activated" if course.is_active else "deactivated"
     messages.success(request, f'✅ Training course "{course.name}" {status} successfully!')
@@ -646,6 +601,7 @@ def delete_user(request, user_id):
     if request.method == 'POST':
         username = user_to_delete.username
         user_to_delete.delete()
+        cache.delete(MASTER_USERS_COUNT_KEY)
         messages.success(request, f'✅ User "{username}" deleted successfully!')
         return redirect('simple_admin:manage_users')
     
@@ -667,7 +623,7 @@ def edit_user(request, user_id):
         return redirect('simple_admin:simple_admin_dashboard')
     
     try:
-        user_to_edit = CustomUser.objects.get(id=user_id)
+        user_to_edit = CustomUser.objects.prefetch_related('assigned_regions').get(id=user_id)
     except CustomUser.DoesNotExist:
         messages.error(request, '❌ User not found.')
         return redirect('simple_admin:manage_users')
@@ -679,6 +635,7 @@ def edit_user(request, user_id):
         user_to_edit.email = request.POST.get('email')
         user_to_edit.user_type = request.POST.get('user_type')
         user_to_edit.is_active = request.POST.get('is_active') == 'on'
+        update_fields = ['first_name', 'last_name', 'email', 'user_type', 'is_active']
         
         # Handle password if provided
         new_password = request.POST.get('new_password')
@@ -687,33 +644,42 @@ def edit_user(request, user_id):
         if new_password:
             if new_password != confirm_password:
                 messages.error(request, '❌ Passwords do not match.')
-                training_pages = TrainingPage.objects.filter(is_active=True)
+                training_pages = get_active_training_pages()
                 return render(request, 'training_app/simple_admin/edit_user.html', {
                     'user': user_to_edit,
-                    'training_pages': training_pages
+                    'training_pages': training_pages,
+                    'assigned_ids': {r.id for r in user_to_edit.assigned_regions.all()},
                 })
             user_to_edit.set_password(new_password)
+            update_fields.append('password')
         
-        # Handle assigned regions for admin users
+        # Handle assigned regions for admin users, writing only the delta
+        # against the prefetched assignments
+        current_regions = {r.id for r in user_to_edit.assigned_regions.all()}
         if user_to_edit.user_type == 'admin':
             # Get selected regions
-            selected_regions = request.POST.getlist('assigned_regions')
-            user_to_edit.assigned_regions.set(selected_regions)
+            selected_regions = {int(pk) for pk in request.POST.getlist('assigned_regions')}
         else:
             # Clear assigned regions for master users
-            user_to_edit.assigned_regions.clear()
+            selected_regions = set()
+        if current_regions - selected_regions:
+            user_to_edit.assigned_regions.remove(*(current_regions - selected_regions))
+        if selected_regions - current_regions:
+            user_to_edit.assigned_regions.add(*(selected_regions - current_regions))
         
         try:
-            user_to_edit.save()
+            user_to_edit.save(update_fields=update_fields)
+            cache.delete(MASTER_USERS_COUNT_KEY)
             messages.success(request, f'✅ User "{user_to_edit.username}" updated successfully!')
             return redirect('simple_admin:manage_users')
         except Exception as e:
             messages.error(request, f'❌ Error updating user: {str(e)}')
     
     # Get all training pages for region selection
-    training_pages = TrainingPage.objects.filter(is_active=True)
+    training_pages = get_active_training_pages()
     
     return render(request, 'training_app/simple_admin/edit_user.html', {
         'user': user_to_edit,
-        'training_pages': training_pages
+        'training_pages': training_pages,
+        'assigned_ids': {r.id for r in user_to_edit.assigned_regions.all()},
     })
@@ -3,16 +3,47 @@ Custom validators for the Toyota Virtual Training Session Admin application.
 """
 
 import re
+import string
 import logging
+from datetime import date, time, timedelta
+import pytz
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
-from django.core.validators import URLValidator
 from django.conf import settings
 import requests
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+# Valid Teams domains
+_VALID_TEAMS_DOMAINS = frozenset((
+    'teams.microsoft.com',
+    'teams.live.com',
+    'teams.microsoft.us',
+    'teams.microsoft.de',
+    'teams.microsoft.cn',
+))
+# meetup-join, meet, l/meetup-join and l/meet as one pattern
+_RE_TEAMS_PATTERN = re.compile(r'(?:l/)?meet(?:up-join)?', re.IGNORECASE)
+
+# Accepted image MIME subtypes (image/pjpeg is what some browsers send for JPEG)
+_IMAGE_MIME_SUBTYPES = frozenset(('jpeg', 'jpg', 'pjpeg', 'png', 'gif', 'webp'))
+
+# Password character classes and common substrings
+_UPPERS = frozenset(string.ascii_uppercase)
+_LOWERS = frozenset(string.ascii_lowercase)
+_SPECIALS = frozenset('!@#$%^&*(),.?":{}|<>')
+_COMMON_PATTERNS = ('123', 'abc', 'password', 'qwerty', 'admin')
+
+# Patterns compiled once at import time
+_RE_USERNAME = re.compile(r'^[a-zA-Z0-9._-]+$')
+_RE_SCRIPT = re.compile(r'<script\b[^<]*(?:(?!<\/script>)<[^<]*)*<\/script>', re.IGNORECASE)
+_RE_EVENTS = re.compile(
+    r'(?:onload|onerror|onclick|onmouseover|onmouseout|onfocus|onblur|onchange|onsubmit|onreset)'
+    r'\s*=\s*["\'][^"\']*["\']',
+    re.IGNORECASE
+)
+
 
 def validate_teams_link(value):
     """
@@ -30,37 +61,15 @@ def validate_teams_link(value):
     if not value:
         return value
     
-    # Basic URL validation
-    url_validator = URLValidator()
-    try:
-        url_validator(value)
-    except ValidationError:
-        raise ValidationError(_('Please enter a valid URL.'))
-    
-    # Check if it's a Teams link
+    # Check if it's an http(s) link on a Teams host. General URL syntax is
+    # left to the URLField's own URLValidator.
     parsed_url = urlparse(value)
-    
-    # Valid Teams domains
-    valid_domains = [
-        'teams.microsoft.com',
-        'teams.live.com',
-        'teams.microsoft.us',
-        'teams.microsoft.de',
-        'teams.microsoft.cn'
-    ]
-    
-    if parsed_url.netloc.lower() not in valid_domains:
+    if (parsed_url.scheme not in ('http', 'https')
+            or parsed_url.netloc.lower() not in _VALID_TEAMS_DOMAINS):
         raise ValidationError(_('Please enter a valid Microsoft Teams meeting link.'))
     
     # Check for required Teams patterns
-    teams_patterns = [
-        'meetup-join',
-        'meet',
-        'l/meetup-join',
-        'l/meet'
-    ]
-    
-    if not any(pattern in value.lower() for pattern in teams_patterns):
+    if not _RE_TEAMS_PATTERN.search(value):
         raise ValidationError(_('This does not appear to be a valid Teams meeting link.'))
     
     return value
@@ -102,8 +111,6 @@ def validate_timezone(value):
     Raises:
         ValidationError: If the timezone is invalid
     """
-    import pytz
-    
     try:
         pytz.timezone(value)
     except pytz.exceptions.UnknownTimeZoneError:
@@ -128,30 +135,38 @@ def validate_password_strength(value):
     if len(value) < 12:
         raise ValidationError(_('Password must be at least 12 characters long.'))
     
-    if not re.search(r'[A-Z]', value):
+    # Single pass over the password for the four character classes
+    has_upper = has_lower = has_digit = has_special = False
+    for ch in value:
+        if ch in _UPPERS:
+            has_upper = True
+        elif ch in _LOWERS:
+            has_lower = True
+        elif ch in _SPECIALS:
+            has_special = True
+        elif ch.isdecimal():
+            has_digit = True
+        else:
+            continue
+        if has_upper and has_lower and has_digit and has_special:
+            break
+    
+    if not has_upper:
         raise ValidationError(_('Password must contain at least one uppercase letter.'))
     
-    if not re.search(r'[a-z]', value):
+    if not has_lower:
         raise ValidationError(_('Password must contain at least one lowercase letter.'))
     
-    if not re.search(r'\d', value):
+    if not has_digit:
         raise ValidationError(_('Password must contain at least one digit.'))
     
-    if not re.search(r'[!@#$%^&*(),.?":{}|<>]', value):
+    if not has_special:
         raise ValidationError(_('Password must contain at least one special character.'))
     
     # Check for common patterns
-    common_patterns = [
-        r'123',
-        r'abc',
-        r'password',
-        r'qwerty',
-        r'admin'
-    ]
-    
-    for pattern in common_patterns:
-        if re.search(pattern, value.lower()):
-            raise ValidationError(_('Password contains common patterns and is not secure.'))
+    lowered = value.lower()
+    if any(pattern in lowered for pattern in _COMMON_PATTERNS):
+        raise ValidationError(_('Password contains common patterns and is not secure.'))
     
     return value
 
@@ -175,7 +190,7 @@ def validate_username(value):
     if len(value) > 30:
         raise ValidationError(_('Username must be no more than 30 characters long.'))
     
-    if not re.match(r'^[a-zA-Z0-9._-]+$', value):
+    if not _RE_USERNAME.match(value):
         raise ValidationError(_('Username can only contain letters, numbers, dots, underscores, and hyphens.'))
     
     if value.startswith('.') or value.endswith('.'):
@@ -250,11 +265,10 @@ def validate_image_format(file):
     Raises:
         ValidationError: If the image format is not allowed
     """
-    allowed_formats = ['JPEG', 'JPG', 'PNG', 'GIF', 'WEBP']
-    
     if hasattr(file, 'content_type'):
-        content_type = file.content_type
-        if not any(fmt.lower() in content_type.lower() for fmt in allowed_formats):
+        # "image/png; charset=..." -> "png"
+        content_type = (file.content_type or '').split(';', 1)[0].strip().lower()
+        if content_type.rsplit('/', 1)[-1] not in _IMAGE_MIME_SUBTYPES:
             raise ValidationError(_('Only JPEG, PNG, GIF, and WEBP images are allowed.'))
     
     return file
@@ -273,8 +287,6 @@ def validate_training_session_date(value):
     Raises:
         ValidationError: If the date is invalid
     """
-    from datetime import date, timedelta
-    
     today = date.today()
     max_future_date = today + timedelta(days=365)  # 1 year in the future
     min_past_date = today - timedelta(days=30)  # 30 days in the past
@@ -301,8 +313,6 @@ def validate_training_session_time(value):
     Raises:
         ValidationError: If the time is invalid
     """
-    from datetime import time
-    
     # Business hours: 8:00 AM to 6:00 PM
     business_start = time(8, 0)
     business_end = time(18, 0)
@@ -326,21 +336,11 @@ def sanitize_html(value):
     if not isinstance(value, str):
         return value
     
-    # Remove script tags and event handlers
-    import re
-    
     # Remove script tags
-    value = re.sub(r'<script\b[^<]*(?:(?!<\/script>)<[^<]*)*<\/script>', '', value, flags=re.IGNORECASE)
+    value = _RE_SCRIPT.sub('', value)
     
     # Remove event handlers
-    event_handlers = [
-        'onload', 'onerror', 'onclick', 'onmouseover', 'onmouseout',
-        'onfocus', 'onblur', 'onchange', 'onsubmit', 'onreset'
-    ]
-    
-    for handler in event_handlers:
-        pattern = rf'{handler}\s*=\s*["\'][^"\']*["\']'
-        value = re.sub(pattern, '', value, flags=re.IGNORECASE)
+    value = _RE_EVENTS.sub('', value)
     
     return value
 
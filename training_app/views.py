@@ -1,15 +1,56 @@
-from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, Http404
+from django.shortcuts import render, redirect
+from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from django.conf import settings
+from django.db.models import Count, Q
 import requests
+from requests.adapters import HTTPAdapter
 import pytz
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
+from functools import lru_cache
 from .models import TrainingPage, TrainingSession, CustomUser
+from .performance import get_training_page, get_active_training_pages
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Shared HTTP session for Teams link checks, so repeated checks reuse
+# pooled connections instead of a new TCP/TLS handshake each time
+_HEAD_SESSION = requests.Session()
+_HEAD_SESSION.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=10))
+_HEAD_SESSION.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
+# Session times are stored in Eastern time
+EASTERN_TZ = pytz.timezone('America/Toronto')
+
+# Regions that can be served from their own subdomain (quebec.rtmtoyota.ca, ...)
+VALID_REGIONS = frozenset(code for code, _ in TrainingPage.REGION_CHOICES)
+
+
+@lru_cache(maxsize=32)
+def _get_timezone(name):
+    """Return the pytz zone for ``name``, memoized per process"""
+    return pytz.timezone(name)
+
+
+@lru_cache(maxsize=256)
+def _region_from_host(host):
+    """
+    Return the region served on ``host``, or None for the main domain.
+    
+    Hosts have already been checked against ALLOWED_HOSTS by get_host(), so
+    the set of distinct inputs stays small.
+    """
+    parts = host.split(':')[0].split('.')
+    
+    # Check if we have a subdomain (more than 2 parts: subdomain.domain.tld)
+    if len(parts) >= 3 and parts[0] in VALID_REGIONS:
+        return parts[0]
+    return None
 
 
 def training_page_view(request, region):
@@ -17,78 +58,90 @@ def training_page_view(request, region):
     Public view for displaying training schedules for each region
     This is what visitors will see when they go to quebec.rtmtoyota.ca, etc.
     """
-    try:
-        # Get the training page for this region with fresh program data
-        training_page = get_object_or_404(TrainingPage.objects.select_related('current_program'), region=region, is_active=True)
-        
-        # Debug image URL for troubleshooting
-        if training_page.current_program and training_page.current_program.main_image:
-            print(f"🔍 Region {region} - Image URL: {training_page.current_program.main_image.url}")
-            print(f"🔍 Region {region} - Image name: {training_page.current_program.main_image.name}")
-        
-        # Note: We don't check for current_program here anymore
-        # Sessions should be shown regardless of whether a current_program is assigned
-        
-        # Convert Eastern Time sessions to regional timezone
-        eastern_tz = pytz.timezone('America/Toronto')
-        regional_tz = pytz.timezone(training_page.timezone)
-        
-        # Get current time in regional timezone
-        now_regional = regional_tz.localize(datetime.now())
-        cutoff_time = now_regional - timedelta(hours=36)
-        
-        # Get timezone abbreviation
-        regional_tz_abbr = now_regional.strftime('%Z')
-        
-        # Get all active training sessions for this page, ordered by date and time
-        all_sessions = training_page.sessions.all().order_by('date', 'time_est')
-        
-        # Filter out sessions that are more than 36 hours old
-        sessions_with_regional_time = []
-        for session in all_sessions:
-            # Create datetime object in Eastern Time
-            eastern_datetime = eastern_tz.localize(
-                datetime.combine(session.date, session.time_est)
-            )
-            
-            # Convert to regional timezone
-            regional_datetime = eastern_datetime.astimezone(regional_tz)
-            
-            # Only include sessions that are not more than 36 hours old
-            if regional_datetime >= cutoff_time:
-                # Add regional time to session object
-                session.regional_time = regional_datetime.time()
-                session.regional_datetime = regional_datetime
-                sessions_with_regional_time.append(session)
-        
-        # Prepare context data for the template
-        # Determine display title (French for Quebec if available)
-        display_title = training_page.title
-        try:
-            if training_page.region == 'quebec':
-                prog = training_page.current_program
-                if prog and getattr(prog, 'title_fr', ''):
-                    display_title = prog.title_fr
-        except Exception:
-            pass
-
-        context = {
-            'training_page': training_page,
-            'sessions': sessions_with_regional_time,
-            'region_display': training_page.get_region_display(),
-            'timezone': training_page.timezone,
-            'regional_tz_abbr': regional_tz_abbr,
-            'display_title': display_title,
-        }
-        
-        return render(request, 'training_app/training_page.html', context)
-        
-    except Http404:
+    # Get the training page for this region with its program (cached);
+    # unknown region slugs never reach the database
+    training_page = get_training_page(region) if region in VALID_REGIONS else None
+    if training_page is None:
         # If region doesn't exist, show a nice error page
         return render(request, 'training_app/region_not_found.html', {
             'region': region,
-            'available_regions': TrainingPage.objects.filter(is_active=True).values_list('region', flat=True)
+            'available_regions': [page.region for page in get_active_training_pages()],
         })
+    
+    # Debug image URL for troubleshooting
+    if (training_page.current_program and training_page.current_program.main_image
+            and logger.isEnabledFor(logging.DEBUG)):
+        logger.debug("Region %s - Image URL: %s", region, training_page.current_program.main_image.url)
+        logger.debug("Region %s - Image name: %s", region, training_page.current_program.main_image.name)
+    
+    # Note: We don't check for current_program here anymore
+    # Sessions should be shown regardless of whether a current_program is assigned
+    
+    # Convert Eastern Time sessions to regional timezone
+    eastern_tz = EASTERN_TZ
+    regional_tz = _get_timezone(training_page.timezone)
+    
+    # Get current time in regional timezone
+    now_regional = timezone.now().astimezone(regional_tz)
+    cutoff_time = now_regional - timedelta(hours=36)
+    
+    # Get timezone abbreviation
+    regional_tz_abbr = now_regional.strftime('%Z')
+    
+    cutoff_naive = cutoff_time.replace(tzinfo=None)
+    
+    # Get training sessions for this page from the cutoff onwards (in the
+    # stored Eastern time), ordered by date and time. The (training_page,
+    # date, time_est) unique index backs both the filter and the ordering.
+    cutoff_eastern = cutoff_time.astimezone(eastern_tz)
+    all_sessions = training_page.sessions.filter(
+        Q(date__gt=cutoff_eastern.date())
+        | Q(date=cutoff_eastern.date(), time_est__gte=cutoff_eastern.time())
+    ).order_by('date', 'time_est')
+    
+    # Eastern -> regional offset, computed once per date. Sessions are
+    # limited to business hours and DST changes happen at 2 AM, so the
+    # offset at noon holds for every session on that day.
+    offsets = {}
+    
+    # Filter out sessions that are more than 36 hours old
+    sessions_with_regional_time = []
+    for session in all_sessions:
+        delta = offsets.get(session.date)
+        if delta is None:
+            noon = datetime.combine(session.date, time(12))
+            delta = offsets[session.date] = regional_tz.utcoffset(noon) - eastern_tz.utcoffset(noon)
+        
+        # Wall-clock time in the regional timezone
+        regional_datetime = datetime.combine(session.date, session.time_est) + delta
+        
+        # Only include sessions that are not more than 36 hours old
+        if regional_datetime >= cutoff_naive:
+            # Add regional time to session object
+            session.regional_time = regional_datetime.time()
+            sessions_with_regional_time.append(session)
+    
+    # Prepare context data for the template
+    # Determine display title (French for Quebec if available)
+    display_title = training_page.title
+    try:
+        if training_page.region == 'quebec':
+            prog = training_page.current_program
+            if prog and getattr(prog, 'title_fr', ''):
+                display_title = prog.title_fr
+    except Exception:
+        pass
+
+    context = {
+        'training_page': training_page,
+        'sessions': sessions_with_regional_time,
+        'region_display': training_page.get_region_display(),
+        'timezone': training_page.timezone,
+        'regional_tz_abbr': regional_tz_abbr,
+        'display_title': display_title,
+    }
+    
+    return render(request, 'training_app/training_page.html', context)
 
 
 def home_redirect(request):
@@ -97,20 +150,10 @@ def home_redirect(request):
     - If on a regional subdomain (quebec.rtmtoyota.ca), show that region's training page
     - Otherwise, show "coming soon" page for main domain
     """
-    # Get the host and extract subdomain
-    host = request.get_host().split(':')[0]
-    parts = host.split('.')
-    
-    # Valid regions
-    valid_regions = ['quebec', 'central', 'pacific', 'prairie', 'atlantic']
-    
-    # Check if we have a subdomain (more than 2 parts: subdomain.domain.tld)
-    if len(parts) >= 3:
-        subdomain = parts[0]
-        
-        # If subdomain matches a region, serve that region's content
-        if subdomain in valid_regions:
-            return training_page_view(request, subdomain)
+    # If the subdomain matches a region, serve that region's content
+    region = _region_from_host(request.get_host())
+    if region:
+        return training_page_view(request, region)
     
     # Otherwise show "coming soon" page for main domain
     return render(request, 'training_app/coming_soon.html')
@@ -123,23 +166,26 @@ def admin_dashboard(request):
     """
     user = request.user
     
-    if user.user_type == 'master':
-        # Master users can see all pages and sessions
-        training_pages = TrainingPage.objects.filter(is_active=True)
-        total_sessions = TrainingSession.objects.count()
-        recent_sessions = TrainingSession.objects.select_related('training_page').order_by('-updated_at')[:10]
-    else:
-        # Admin users can only see their assigned regions
-        # Note: We'll need to add a relationship between users and regions
-        # For now, let's show all pages but we'll restrict editing later
-        training_pages = TrainingPage.objects.filter(is_active=True)
-        total_sessions = TrainingSession.objects.count()
-        recent_sessions = TrainingSession.objects.select_related('training_page').order_by('-updated_at')[:10]
+    # Master and admin users currently see the same pages and sessions
+    # (admins will be restricted to their assigned regions later)
+    training_pages = list(
+        TrainingPage.objects.filter(is_active=True)
+        .annotate(session_count=Count('sessions'))
+        .order_by('region')  # Meta.ordering is ignored for GROUP BY queries
+    )
+    recent_sessions = TrainingSession.objects.select_related('training_page').only(
+        'id', 'date', 'time_est', 'teams_link', 'teams_link_valid', 'updated_at',
+        'training_page', 'training_page__region',
+    ).order_by('-updated_at')[:10]
     
-    # Get some statistics
-    active_pages = training_pages.count()
-    sessions_with_valid_links = TrainingSession.objects.filter(teams_link_valid=True).count()
-    total_sessions_count = TrainingSession.objects.count()
+    # Get some statistics in a single query
+    active_pages = len(training_pages)
+    counts = TrainingSession.objects.aggregate(
+        total=Count('id'),
+        valid=Count('id', filter=Q(teams_link_valid=True)),
+    )
+    total_sessions = total_sessions_count = counts['total']
+    sessions_with_valid_links = counts['valid']
     
     context = {
         'user': user,
@@ -180,25 +226,28 @@ def test_teams_link(request, session_id):
     """
     if request.method == 'POST' and request.user.is_authenticated:
         try:
-            session = TrainingSession.objects.get(id=session_id)
+            teams_link = TrainingSession.objects.filter(id=session_id).values_list('teams_link', flat=True).first()
+            if teams_link is None:
+                return JsonResponse({'success': False, 'error': 'Session not found'})
             
             # Test the Teams link
-            is_valid = validate_teams_link(session.teams_link)
+            is_valid = validate_teams_link(teams_link)
             
-            # Update the session
-            session.teams_link_valid = is_valid
-            session.teams_link_last_tested = timezone.now()
-            session.save()
+            # Update only the test result columns
+            tested_at = timezone.now()
+            TrainingSession.objects.filter(id=session_id).update(
+                teams_link_valid=is_valid,
+                teams_link_last_tested=tested_at,
+                updated_at=tested_at,
+            )
             
             return JsonResponse({
                 'success': True,
                 'is_valid': is_valid,
-                'tested_at': session.teams_link_last_tested.isoformat(),
+                'tested_at': tested_at.isoformat(),
                 'message': 'Link is working!' if is_valid else 'Link is not accessible'
             })
             
-        except TrainingSession.DoesNotExist:
-            return JsonResponse({'success': False, 'error': 'Session not found'})
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
     
@@ -212,7 +261,7 @@ def validate_teams_link(url):
     if not url:
         return False
     
-    # Check if it's a valid Teams URL format
+    # Check if it's a valid Teams URL format (no network call needed)
     if 'teams.microsoft.com' not in url and 'teams.live.com' not in url:
         return False
     
@@ -221,9 +270,9 @@ def validate_teams_link(url):
     if 'meetup-join' in url or 'meet' in url:
         return True
     
-    # Fallback to HTTP check for other URLs
+    # Fallback to HTTP check for other Teams URLs, over the pooled session
     try:
-        response = requests.head(url, timeout=5, allow_redirects=True)
+        response = _HEAD_SESSION.head(url, timeout=5, allow_redirects=True)
         return response.status_code in [200, 302, 403]  # 403 is common for Teams links
         
     except requests.RequestException:
@@ -235,36 +284,35 @@ def get_session_status(request, session_id):
     """
     AJAX endpoint to get real-time session status (for the JavaScript)
     """
-    try:
-        session = TrainingSession.objects.get(id=session_id)
-        
-        # Calculate session status based on current time
-        now = timezone.now()
-        session_datetime = datetime.combine(session.date, session.time_est)
-        
-        # Convert to Eastern time (we'll need to handle timezone conversion properly)
-        # For now, let's assume the session_datetime is already in Eastern time
-        
-        if now < session_datetime:
-            status = 'upcoming'
-            time_remaining = session_datetime - now
-            message = f'Starts in {format_timedelta(time_remaining)}'
-        elif now <= session_datetime + timedelta(minutes=30):  # 30 minute window
-            status = 'active'
-            time_remaining = (session_datetime + timedelta(minutes=30)) - now
-            message = f'Active - {format_timedelta(time_remaining)} remaining'
-        else:
-            status = 'ended'
-            message = 'Session ended'
-        
-        return JsonResponse({
-            'status': status,
-            'message': message,
-            'teams_link_valid': session.teams_link_valid
-        })
-        
-    except TrainingSession.DoesNotExist:
+    session = TrainingSession.objects.only(
+        'date', 'time_est', 'teams_link_valid'
+    ).filter(id=session_id).first()
+    if session is None:
         return JsonResponse({'error': 'Session not found'}, status=404)
+    
+    # Calculate session status based on current time
+    now = timezone.now()
+    
+    # Session times are stored in Eastern time
+    session_datetime = EASTERN_TZ.localize(datetime.combine(session.date, session.time_est))
+    
+    if now < session_datetime:
+        status = 'upcoming'
+        time_remaining = session_datetime - now
+        message = f'Starts in {format_timedelta(time_remaining)}'
+    elif now <= session_datetime + timedelta(minutes=30):  # 30 minute window
+        status = 'active'
+        time_remaining = (session_datetime + timedelta(minutes=30)) - now
+        message = f'Active - {format_timedelta(time_remaining)} remaining'
+    else:
+        status = 'ended'
+        message = 'Session ended'
+    
+    return JsonResponse({
+        'status': status,
+        'message': message,
+        'teams_link_valid': session.teams_link_valid
+    })
 
 
 def format_timedelta(td):
@@ -272,16 +320,13 @@ def format_timedelta(td):
     Format timedelta for display (e.g., "2d 3h 15m")
     """
     total_minutes = int(td.total_seconds() / 60)
-    days = total_minutes // (24 * 60)
-    hours = (total_minutes % (24 * 60)) // 60
-    minutes = total_minutes % 60
+    days, rest = divmod(total_minutes, 24 * 60)
+    hours, minutes = divmod(rest, 60)
     
-    parts = []
     if days > 0:
-        parts.append(f'{days}d')
+        if hours > 0:
+            return f'{days}d {hours}h {minutes}m' if minutes > 0 else f'{days}d {hours}h'
+        return f'{days}d {minutes}m' if minutes > 0 else f'{days}d'
     if hours > 0:
-        parts.append(f'{hours}h')
-    if minutes > 0 or not parts:
-        parts.append(f'{minutes}m')
-    
-    return ' '.join(parts)
\ No newline at end of file
+        return f'{hours}h {minutes}m' if minutes > 0 else f'{hours}h'
+    return f'{minutes}m'
\ No newline at end of file